@@ -12,6 +12,8 @@ Usage:
 """
 import argparse
 import os
+import re
+from collections import Counter
 import pandas as pd
 import numpy as np
 
@@ -22,6 +24,7 @@ RISKY_MEMO_TERMS = [
     "manual override", "adjustment", "adj", "suspense",
     "top-side", "plug", "write-off", "reclass", "misc"
 ]
+_RISKY_RE = re.compile("|".join(re.escape(t) for t in RISKY_MEMO_TERMS))
 
 WEIGHTS = {
     "round_100": 1,
@@ -34,69 +37,83 @@ WEIGHTS = {
     "duplicate": 3,
     "top1pct": 2,
 }
+RULES = list(WEIGHTS)
 
 
 # ---- Core -------------------------------------------------------------------
 
-def _is_round_multiple(x, m: int) -> bool:
-    try:
-        return (abs(float(x)) % m) == 0
-    except Exception:
-        return False
-
-
 def analyze(df: pd.DataFrame) -> pd.DataFrame:
-    d = df.copy()
+    # Build coerced and derived columns in a narrow frame rather than copying
+    # the whole input; untouched input columns are attached before sorting
+    d = pd.DataFrame(index=df.index)
 
     # Ensure types / columns exist
-    d["amount"] = pd.to_numeric(d.get("amount"), errors="coerce")
-    d["date"] = pd.to_datetime(d.get("date"), errors="coerce")
+    # Already-typed columns (e.g. parsed by read_csv) skip the conversion pass
+    amount, date = df.get("amount"), df.get("date")
+    if not pd.api.types.is_numeric_dtype(amount):
+        amount = pd.to_numeric(amount, errors="coerce")
+    if not pd.api.types.is_datetime64_any_dtype(date):
+        date = pd.to_datetime(date, errors="coerce")
+    d["amount"] = amount
+    d["date"] = date
 
     for col in ["memo", "user", "account", "source"]:
-        if col not in d:
-            d[col] = ""
-        d[col] = d[col].astype(str).fillna("")
+        d[col] = df[col].astype(str).fillna("") if col in df else ""
 
     # Default empty sources to SYSTEM
     d["source"] = d["source"].replace("", "SYSTEM")
 
-    # ---- Rules
-    d["round_100"]  = d["amount"].apply(lambda x: _is_round_multiple(x, 100))
-    d["round_1000"] = d["amount"].apply(lambda x: _is_round_multiple(x, 1000))
-    d["cents_zero"] = (np.round((np.abs(d["amount"]) * 100) % 100, 2) == 0.0)
+    # Low-cardinality text columns group and dedupe faster as categoricals
+    for col in ["user", "account", "source"]:
+        d[col] = d[col].astype("category")
 
-    d["weekend"]    = d["date"].dt.weekday.isin([5, 6])
-    d["late_night"] = d["date"].dt.hour.isin([22, 23, 0, 1, 2, 3, 4, 5])
+    # ---- Rules
+    # NaN % m is NaN, and NaN == 0 is False, so missing amounts never match
+    abs_amt = d["amount"].abs().to_numpy(dtype=float, na_value=np.nan)
+    d["round_100"]  = np.mod(abs_amt, 100) == 0
+    d["round_1000"] = np.mod(abs_amt, 1000) == 0
+    cents = np.rint(abs_amt * 100)
+    d["cents_zero"] = np.mod(cents, 100) == 0
+
+    # Missing dates give NaN here, which fails both comparisons
+    wd = d["date"].dt.weekday.to_numpy(dtype=float, na_value=np.nan)
+    hr = d["date"].dt.hour.to_numpy(dtype=float, na_value=np.nan)
+    d["weekend"]    = wd >= 5
+    d["late_night"] = (hr <= 5) | (hr >= 22)
 
     lower_memo = d["memo"].str.lower()
-    d["risky_memo"] = lower_memo.apply(lambda s: any(term in s for term in RISKY_MEMO_TERMS))
+    d["risky_memo"] = lower_memo.str.contains(_RISKY_RE, regex=True, na=False)
 
     d["manual_source"] = d["source"].str.upper().ne("SYSTEM")
 
     # Top 1% by absolute amount (95% if dataset is very small)
-    abs_amt = d["amount"].abs()
-    cutoff = abs_amt.quantile(0.99) if len(d) >= 100 else abs_amt.quantile(0.95)
+    # Selecting the ceil((n-1)*q)-th value flags the same rows as an
+    # interpolated quantile would, without a full sort
+    q = 0.99 if len(d) >= 100 else 0.95
+    known = abs_amt[~np.isnan(abs_amt)]
+    if len(known):
+        k = int(np.ceil((len(known) - 1) * q))
+        cutoff = np.partition(known, k)[k]
+    else:
+        cutoff = np.nan
     d["top1pct"] = abs_amt >= cutoff
 
     # Duplicate key: same day + account + amount + memo(lower)
-    key = (
-        d["date"].dt.date.astype(str) + "|" +
-        d["account"] + "|" +
-        d["amount"].round(2).astype(str) + "|" +
-        lower_memo
-    )
-    counts = key.value_counts(dropna=False)
-    d["duplicate"] = key.map(counts).fillna(0).astype(int) > 1
-
-    # Score + reasons
-    cols = [
-        "round_100", "round_1000", "cents_zero",
-        "weekend", "late_night",
-        "risky_memo", "manual_source", "duplicate", "top1pct"
-    ]
-    weights = pd.Series(WEIGHTS)[cols]
-    d["risk_score"] = d[cols].mul(weights, axis=1).sum(axis=1).astype(int)
-    d["reasons"] = d.apply(lambda row: ",".join([c for c in cols if bool(row[c])]), axis=1)
+    key = pd.DataFrame({
+        "day": d["date"].dt.normalize(),
+        "account": d["account"],
+        "amount": d["amount"].round(2),
+        "memo": lower_memo,
+    })
+    d["duplicate"] = key.duplicated(keep=False)
+
+    # Score (reasons are only built for flagged rows, in write_outputs)
+    flags = np.stack([d[c].to_numpy(dtype=bool) for c in RULES], axis=1).astype(np.uint8)
+    weights = np.array([WEIGHTS[c] for c in RULES], dtype=np.int32)
+    d["risk_score"] = flags @ weights
+
+    order = list(df.columns) + [c for c in d.columns if c not in df.columns]
+    d = pd.concat([df.drop(columns=d.columns, errors="ignore"), d], axis=1)[order]
 
     # Sort by score then absolute amount (stable)
     d["abs_amount"] = d["amount"].abs().fillna(0)
@@ -108,6 +125,9 @@ def write_outputs(d: pd.DataFrame, outdir: str) -> None:
     os.makedirs(outdir, exist_ok=True)
 
     risky = d[d["risk_score"] >= 2].copy()
+    flags = risky[RULES].to_numpy(dtype=bool)
+    names = np.array(RULES)
+    risky["reasons"] = [",".join(names[row].tolist()) for row in flags]
     risky_cols = ["entry_id", "date", "user", "account", "amount", "memo", "source", "risk_score", "reasons"]
     for col in risky_cols:
         if col not in risky:
@@ -118,9 +138,12 @@ def write_outputs(d: pd.DataFrame, outdir: str) -> None:
     flagged = len(risky)
 
     if flagged:
-        top_rules = (risky["reasons"].str.split(",").explode().value_counts().head(5)).to_dict()
-        by_user = risky.groupby("user")["risk_score"].sum().sort_values(ascending=False).head(5).to_dict()
-        by_account = risky.groupby("account")["risk_score"].sum().sort_values(ascending=False).head(5).to_dict()
+        hits = Counter({c: int(n) for c, n in zip(RULES, flags.sum(axis=0)) if n})
+        top_rules = dict(hits.most_common(5))
+        # One pass over the flagged rows; per-user/account totals roll up from it
+        agg = risky.groupby(["user", "account"], observed=True)["risk_score"].sum()
+        by_user = agg.groupby(level=0, observed=True).sum().nlargest(5).to_dict()
+        by_account = agg.groupby(level=1, observed=True).sum().nlargest(5).to_dict()
     else:
         top_rules, by_user, by_account = {}, {}, {}
 
@@ -166,7 +189,10 @@ def main():
     ap.add_argument("--out", default="out", help="Output folder")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.csv)
+    # Read text columns as strings up front so pandas skips type inference
+    # (and account codes like 1000 don't come back as ints or floats)
+    text_cols = ["entry_id", "user", "account", "memo", "source"]
+    df = pd.read_csv(args.csv, dtype={c: str for c in text_cols})
     analyzed = analyze(df)
     write_outputs(analyzed, args.out)
 
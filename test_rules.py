@@ -1,6 +1,21 @@
 import pandas as pd
-from risky_journals import analyze
+from risky_journals import analyze, write_outputs
 def make_df(**k): return pd.DataFrame(k)
 def test_round():
     df = make_df(entry_id=['A','B'],date=['2024-01-01 10:00:00','2024-01-01 10:05:00'],user=['U','U'],account=['1000','1000'],amount=[200.00,123.45],memo=['x','x'],source=['SYSTEM','SYSTEM'])
     out = analyze(df); assert bool(out.loc[0,'round_100']) and not bool(out.loc[1,'round_100'])
+def test_round_missing_amount():
+    df = make_df(entry_id=['A','B'],date=['2024-01-01 10:00:00','2024-01-01 10:05:00'],user=['U','U'],account=['1000','1000'],amount=['n/a',1000.00],memo=['x','y'],source=['SYSTEM','SYSTEM'])
+    out = analyze(df).set_index('entry_id'); assert not bool(out.loc['A','round_100']) and not bool(out.loc['A','round_1000']) and bool(out.loc['B','round_1000'])
+def test_duplicate():
+    df = make_df(entry_id=['A','B','C'],date=['2024-01-01 10:00:00','2024-01-01 18:30:00','2024-01-02 10:00:00'],user=['U','V','U'],account=['1000','1000','1000'],amount=[55.10,55.10,55.10],memo=['Fee','fee','fee'],source=['SYSTEM','SYSTEM','SYSTEM'])
+    out = analyze(df).set_index('entry_id'); assert bool(out.loc['A','duplicate']) and bool(out.loc['B','duplicate']) and not bool(out.loc['C','duplicate'])
+def test_duplicate_missing_date():
+    df = make_df(entry_id=['A','B'],date=[None,None],user=['U','U'],account=['1000','2000'],amount=[55.10,55.10],memo=['fee','fee'],source=['SYSTEM','SYSTEM'])
+    out = analyze(df); assert not out['duplicate'].any()
+def test_write_outputs(tmp_path):
+    df = make_df(entry_id=['A','B','C'],date=['2024-01-06 23:00:00','2024-01-03 12:00:00','2024-01-03 12:00:00'],user=['U','U','V'],account=['1000','1000','2000'],amount=[1000.00,12.34,55.10],memo=['Adj','x','misc'],source=['MANUAL','SYSTEM','SYSTEM'])
+    write_outputs(analyze(df), str(tmp_path))
+    risky = pd.read_csv(tmp_path / 'risky.csv').set_index('entry_id'); assert list(risky.index) == ['A','C']
+    assert risky.loc['A','reasons'] == 'round_100,round_1000,cents_zero,weekend,late_night,risky_memo,manual_source,top1pct' and risky.loc['C','reasons'] == 'risky_memo'
+    summary = (tmp_path / 'summary.md').read_text(); assert '- risky_memo: **2**' in summary and '- round_100: **1**' in summary and '- duplicate:' not in summary.split('## Highest')[0]